@@ -44,6 +44,10 @@ class Searcher:
         except json.JSONDecodeError:
             raise Exception(f"数据文件 {self.data_file} 格式错误")
 
+    def set_data(self, data: Dict[str, Any]):
+        # 直接使用调用方已在内存中的数据，省去重新读取和解析文件
+        self.data = data
+
     def _init_openai_client(self) -> OpenAI:
         # 从token文件初始化OpenAI客户端
         try:
@@ -464,46 +468,49 @@ class Searcher:
         }
 
     def display_results(self, search_results: Dict[str, Any]):
-        # 在控制台格式化显示搜索结果
-        print(f"\n搜索查询: {search_results['query']} ")
+        # 在控制台格式化显示搜索结果，先拼好所有行再一次性输出
+        lines = ["", f"搜索查询: {search_results['query']} "]
 
         filters = search_results['search_filters']
         if filters['group_name'] or filters['topic_name']:
-            print("搜索范围:")
+            lines.append("搜索范围:")
             if filters['group_name']:
-                print(f"  - 群聊: {filters['group_name']}")
+                lines.append(f"  - 群聊: {filters['group_name']}")
             if filters['topic_name']:
-                print(f"  - 话题: {filters['topic_name']}")
-            print()
+                lines.append(f"  - 话题: {filters['topic_name']}")
+            lines.append("")
 
-        print(f"关键词匹配: {search_results['stats']['keyword_matches']} 个")
-        print(f"AI推荐: {search_results['stats']['ai_recommendations']} 个\n")
+        lines.append(f"关键词匹配: {search_results['stats']['keyword_matches']} 个")
+        lines.append(f"AI推荐: {search_results['stats']['ai_recommendations']} 个")
+        lines.append("")
 
         if search_results['keyword_results']:
-            print("关键词匹配结果:")
+            lines.append("关键词匹配结果:")
             for i, result in enumerate(search_results['keyword_results'], 1):
-                print(f"{i}. [{result['group_info']['group_name']}] {result['topic_name']} "
-                      f"(优先级: {result['priority']}, 匹配度: {result['search_score']})")
+                lines.append(f"{i}. [{result['group_info']['group_name']}] {result['topic_name']} "
+                             f"(优先级: {result['priority']}, 匹配度: {result['search_score']})")
                 if result.get('summaries'):
-                    print(f"   摘要: {result['summaries'][0]}")
+                    lines.append(f"   摘要: {result['summaries'][0]}")
                 if result.get('related_topics'):
-                    print(f"   相关主题: {', '.join(result['related_topics'])}")
+                    lines.append(f"   相关主题: {', '.join(result['related_topics'])}")
                 for detail in result['match_details'][:2]:
-                    print(f"   - {detail}")
-                print()
+                    lines.append(f"   - {detail}")
+                lines.append("")
 
         if search_results['ai_recommendations']:
-            print("AI智能推荐 (每个群聊最多3个):")
+            lines.append("AI智能推荐 (每个群聊最多3个):")
             for i, result in enumerate(search_results['ai_recommendations'], 1):
                 topic = result['topic_info']
-                print(f"{i}. [{topic['group_info']['group_name']}] {topic['topic_name']} "
-                      f"(置信度: {result['confidence']:.2f})")
+                lines.append(f"{i}. [{topic['group_info']['group_name']}] {topic['topic_name']} "
+                             f"(置信度: {result['confidence']:.2f})")
                 if topic.get('summaries'):
-                    print(f"   摘要: {topic['summaries'][0]}")
+                    lines.append(f"   摘要: {topic['summaries'][0]}")
                 if topic.get('related_topics'):
-                    print(f"   相关主题: {', '.join(topic['related_topics'])}")
-                print(f"   理由: {result['reasoning']}")
-                print()
+                    lines.append(f"   相关主题: {', '.join(topic['related_topics'])}")
+                lines.append(f"   理由: {result['reasoning']}")
+                lines.append("")
+
+        print("\n".join(lines))
 
     def get_available_groups(self) -> List[str]:
         # 获取所有可用的群聊名称
@@ -1,14 +1,34 @@
 import streamlit as st
+import io
 import json
+import hashlib
+import numpy as np
 import plotly.graph_objects as go
 import networkx as nx
 import os
 import sys
 import tempfile
+from collections import Counter
 from datetime import datetime
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+try:
+    import orjson  # 可选：更快的JSON序列化，直接输出bytes
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+try:
+    import igraph as ig  # 可选：C实现的力导向布局
+
+    IGRAPH_AVAILABLE = True
+except ImportError:
+    IGRAPH_AVAILABLE = False
+    ig = None
+
 try:
     from api_use import ChatAnalyzer  # 分工1
 
@@ -40,6 +60,81 @@ except ImportError as e:
     TopicGraph = None
 
 
+def _dump_json_bytes(data, pretty=False):
+    """序列化为UTF-8编码的JSON字节，优先使用orjson"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+    # 直接编码写入字节缓冲区，避免先生成完整的字符串
+    format_options = {"indent": 2} if pretty else {"separators": (",", ":")}
+    buffer = io.BytesIO()
+    writer = io.TextIOWrapper(buffer, encoding='utf-8')
+    json.dump(data, writer, ensure_ascii=False, **format_options)
+    writer.flush()
+    writer.detach()
+    return buffer.getvalue()
+
+
+# 优先级对应的显示颜色
+_PRIORITY_COLOR = {
+    "高": "#FF6B6B",
+    "中": "#4ECDC4",
+    "低": "#45B7D1"
+}
+
+# 优先级排序权重，数值越大越靠前
+_PRIORITY_ORDER = {"高": 3, "中": 2, "低": 1}
+
+# 优先级的显示顺序
+_PRIORITY_KEYS = ("高", "中", "低")
+
+# 话题图中各优先级节点的大小
+_PRIORITY_NODE_SIZE = {"高": 100, "中": 70, "低": 40}
+
+# 数据管理页每页显示的群聊数
+_GROUPS_PER_PAGE = 20
+
+# 空分析数据文件的内容
+_EMPTY_DATA_JSON = b'{"chat_groups": []}'
+
+# 聊天记录中发言人与内容的分隔符，全角冒号优先
+_RECORD_SEPARATORS = ("：", ":")
+
+
+def _char_signature(text):
+    """计算文本的64位字符签名，每个字符按码点低6位置位"""
+    signature = 0
+    for ch in set(text):
+        signature |= 1 << (ord(ch) & 63)
+    return signature
+
+
+def _topic_name_index(topics):
+    """构建话题名称到ID的映射，名称重复时保留第一个"""
+    name_to_id = {}
+    for topic in topics:
+        name_to_id.setdefault(topic['topic_name'], topic['topic_id'])
+    return name_to_id
+
+
+def _compute_overview_stats(chat_groups):
+    """计算概览统计：总消息数、总话题数和各群聊的优先级分布"""
+    total_messages = 0
+    total_topics = 0
+    group_priority_counts = []
+    for group in chat_groups:
+        topics = group.get("topics", [])
+        group_priority_counts.append(Counter(topic.get("priority", "中") for topic in topics))
+        total_messages += sum(len(topic.get("related_records", [])) for topic in topics)
+        total_topics += len(topics)
+
+    return {
+        "total_messages": total_messages,
+        "total_topics": total_topics,
+        "group_priority_counts": group_priority_counts
+    }
+
+
 class FrontendManager:
     def __init__(self):
         # 初始化session state
@@ -51,6 +146,9 @@ class FrontendManager:
         # 加载配置
         self.config = self._load_config()
 
+        # 本次运行已加载的分析数据，Streamlit每次重跑都会新建实例
+        self._data = None
+
         # 初始化各模块实例
         self.analyzer = None  # 分工1实例
         self.searcher = None  # 分工3实例
@@ -68,6 +166,13 @@ class FrontendManager:
             'analysis_data': None,
             'current_group': None,
             'topic_mapping': {},
+            'group_topic_ids': {},  # 群聊ID -> 该群聊的话题ID列表，用于增量维护话题映射
+            'group_by_id': {},  # 群聊ID -> 群聊数据
+            'topic_by_id': {},  # 话题ID -> (话题数据, 所属群聊数据)
+            'topic_index': None,  # (缓存键, 话题浏览页的筛选/排序索引)
+            'overview_stats': None,  # (数据版本, 概览页统计信息)
+            'data_version': 0,  # 分析数据每次变化时递增
+            'topic_mapping_version': -1,  # 话题映射对应的数据版本
             'data_file': None,
             'api_key': "",
             'base_url': "https://api-inference.modelscope.cn/v1/",
@@ -154,14 +259,11 @@ class FrontendManager:
         # 初始化智能搜索模块
         if DIVISION_3_AVAILABLE:
             try:
-                # 检查数据文件是否存在
                 data_file = "output/search_data.json"
                 token_file = "config/api_token.txt"
 
                 # 如果数据文件不存在，创建一个空的
-                if not os.path.exists(data_file):
-                    with open(data_file, 'w', encoding='utf-8') as f:
-                        json.dump({"chat_groups": []}, f)
+                self._ensure_empty_data_file(data_file)
 
                 st.session_state.searcher_instance = Searcher(
                     data_file=data_file,
@@ -179,11 +281,8 @@ class FrontendManager:
         # 初始化话题图谱模块
         if DIVISION_4_AVAILABLE:
             try:
-                # 检查数据文件是否存在
                 graph_file = "output/topic_graph_data.json"
-                if not os.path.exists(graph_file):
-                    with open(graph_file, 'w', encoding='utf-8') as f:
-                        json.dump({"chat_groups": []}, f)
+                self._ensure_empty_data_file(graph_file)
 
                 st.session_state.topic_graph_instance = TopicGraph(graph_file)
                 self.topic_graph = st.session_state.topic_graph_instance
@@ -197,6 +296,17 @@ class FrontendManager:
 
         st.session_state.modules_initialized = True
 
+    def _ensure_empty_data_file(self, file_path):
+        """文件不存在时写入空数据，已存在则跳过（O_EXCL一次系统调用完成判断和创建）"""
+        try:
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            return
+        try:
+            os.write(fd, _EMPTY_DATA_JSON)
+        finally:
+            os.close(fd)
+
     def handle_file_upload(self):
         """处理用户上传的聊天记录文件"""
         st.sidebar.markdown("### 📁 上传聊天记录")
@@ -281,12 +391,8 @@ class FrontendManager:
                         # 默认选择第一个群聊
                         if analysis_result.get("chat_groups"):
                             st.session_state.current_group = analysis_result["chat_groups"][0]["group_id"]
-                        # 构建话题映射
-                        self._build_topic_mapping()
-                        # 保存数据供其他模块使用
+                        # 保存数据供其他模块使用（同时就地刷新各模块数据）
                         self._save_data_to_files()
-                        # 重新初始化模块以加载新数据
-                        self.init_modules()
                         st.sidebar.success("分析完成")
                         st.rerun()
                     else:
@@ -346,8 +452,11 @@ class FrontendManager:
                 records = self.analyzer.parse_file(tmp_file_path)
                 st.info(f"成功解析聊天记录")
 
+                records_hash = self._hash_records(records)
+
                 # 检查是否已存在相同名称的群聊
                 existing_structure = None
+                existing_group = None
                 group_to_replace_index = -1
 
                 if st.session_state.analysis_data:
@@ -355,22 +464,43 @@ class FrontendManager:
                     for i, group in enumerate(existing_structure.get("chat_groups", [])):
                         if group["group_name"] == custom_group_name:
                             group_to_replace_index = i
+                            existing_group = group
                             break
 
-                # 如果有相同名称的群聊，覆盖它
-                if group_to_replace_index >= 0:
-                    # 移除旧的群聊
-                    existing_structure["chat_groups"].pop(group_to_replace_index)
-                    st.info(f"覆盖已存在的群聊: {custom_group_name}")
+                records_to_analyze = records
+                if existing_group is not None:
+                    # 聊天记录未变化，直接复用已有的分析结果，避免重复调用API
+                    if existing_group.get("records_hash") == records_hash:
+                        st.info(f"群聊 {custom_group_name} 的聊天记录未变化，跳过重新分析")
+                        return existing_structure
+
+                    # 上次分析的记录是本次记录的前缀时，只按位置分析追加在后面的记录并合并到原群聊
+                    # （按位置而不是按内容取差，重复出现的"好的""收到"等新消息也会被分析）
+                    old_count = existing_group.get("records_count")
+                    if (old_count and old_count < len(records)
+                            and self._hash_records(records[:old_count]) == existing_group.get("records_hash")):
+                        records_to_analyze = records[old_count:]
+                        st.info(f"群聊 {custom_group_name} 新增 {len(records_to_analyze)} 条记录，仅分析新增部分")
+                    else:
+                        # 如果有相同名称的群聊且内容有删改，覆盖它
+                        existing_structure["chat_groups"].pop(group_to_replace_index)
+                        st.info(f"覆盖已存在的群聊: {custom_group_name}")
 
                 # 生成话题结构
                 result = self.analyzer.analyze_topics(
                     group_name=custom_group_name,
-                    chat_records=records,
+                    chat_records=records_to_analyze,
                     existing_structure=existing_structure,
                     description=f"来自文件: {uploaded_file.name}"
                 )
 
+                # 记录本次内容的哈希，供下次上传时比对
+                for group in result.get("chat_groups", []):
+                    if group["group_name"] == custom_group_name:
+                        group["records_hash"] = records_hash
+                        group["records_count"] = len(records)
+                        break
+
                 st.success("话题分析完成")
                 return result
 
@@ -382,8 +512,18 @@ class FrontendManager:
             st.error(f"分析过程出错: {str(e)}")
             return None
 
+    def _hash_records(self, records):
+        """计算聊天记录内容的哈希，用于判断重复上传"""
+        payload = json.dumps(records, ensure_ascii=False).encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def _mark_data_changed(self):
+        """递增数据版本，使依赖分析数据的派生结果在下次运行时重建"""
+        st.session_state.data_version += 1
+
     def _save_data_to_files(self):
         """保存分析数据到文件，供其他分工使用"""
+        self._mark_data_changed()
         if not st.session_state.analysis_data:
             return
 
@@ -392,42 +532,38 @@ class FrontendManager:
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
 
-        # 保存为统一的数据文件
         data_file = os.path.join(data_dir, "unified_data.json")
-        with open(data_file, 'w', encoding='utf-8') as f:
-            json.dump(st.session_state.analysis_data, f, ensure_ascii=False, indent=2)
-
-        # 保存为搜索模块专用格式
         search_data_file = os.path.join(data_dir, "search_data.json")
-        search_data = {
-            "chat_groups": st.session_state.analysis_data.get("chat_groups", [])
-        }
-        with open(search_data_file, 'w', encoding='utf-8') as f:
-            json.dump(search_data, f, ensure_ascii=False, indent=2)
-
-        # 保存为话题图模块专用格式
         graph_data_file = os.path.join(data_dir, "topic_graph_data.json")
-        graph_data = {
-            "chat_groups": st.session_state.analysis_data.get("chat_groups", [])
-        }
-        with open(graph_data_file, 'w', encoding='utf-8') as f:
-            json.dump(graph_data, f, ensure_ascii=False, indent=2)
+
+        # 搜索模块和话题图模块使用相同的格式
+        chat_groups = st.session_state.analysis_data.get("chat_groups", [])
+        search_data = {"chat_groups": chat_groups}
+        graph_data = {"chat_groups": chat_groups}
+
+        # 三个文件内容相同时只序列化一次
+        groups_payload = _dump_json_bytes(search_data, pretty=True)
+        if st.session_state.analysis_data.keys() == search_data.keys():
+            unified_payload = groups_payload
+        else:
+            unified_payload = _dump_json_bytes(st.session_state.analysis_data, pretty=True)
+
+        for file_path, payload in ((data_file, unified_payload),
+                                   (search_data_file, groups_payload),
+                                   (graph_data_file, groups_payload)):
+            with open(file_path, 'wb') as f:
+                f.write(payload)
 
         if self.analyzer:
             self.analyzer.chat_structure = st.session_state.analysis_data
 
-        if self.searcher and os.path.exists(search_data_file):
-            try:
-                self.searcher.data_file = search_data_file
-                self.searcher.data = self.searcher._load_data()
-            except:
-                pass
+        # 直接把内存中的数据交给各模块，无需重新读取刚写入的文件
+        if self.searcher:
+            self.searcher.data_file = search_data_file
+            self.searcher.set_data(search_data)
 
-        if self.topic_graph and os.path.exists(graph_data_file):
-            try:
-                self.topic_graph.load_from_json(graph_data_file)
-            except:
-                pass
+        if self.topic_graph:
+            self.topic_graph.load_from_data(graph_data)
 
         st.session_state.data_file = data_file
         print("✅ 数据已保存到output目录")
@@ -462,32 +598,38 @@ class FrontendManager:
         # 处理关键词搜索结果
         if 'keyword_results' in search_results:
             for result in search_results['keyword_results']:
+                summaries = result.get('summaries')
+                group_info = result.get('group_info') or {}
+                group_name = group_info.get('group_name', '')
                 converted.append({
                     'topic_id': result.get('topic_id', ''),
                     'topic_name': result.get('topic_name', ''),
-                    'content': result.get('summaries', [''])[0] if result.get('summaries') else '',
-                    'sender': result.get('group_info', {}).get('group_name', ''),
+                    'content': summaries[0] if summaries else '',
+                    'sender': group_name,
                     'score': result.get('search_score', 0) / 10.0,  # 归一化到0-1
                     'search_type': 'keyword',
                     'priority': result.get('priority', '中'),
-                    'group_name': result.get('group_info', {}).get('group_name', ''),
-                    'group_id': result.get('group_info', {}).get('group_id', '')
+                    'group_name': group_name,
+                    'group_id': group_info.get('group_id', '')
                 })
 
         # 处理AI推荐结果
         if 'ai_recommendations' in search_results:
             for result in search_results['ai_recommendations']:
-                topic_info = result.get('topic_info', {})
+                topic_info = result.get('topic_info') or {}
+                summaries = topic_info.get('summaries')
+                group_info = topic_info.get('group_info') or {}
+                group_name = group_info.get('group_name', '')
                 converted.append({
                     'topic_id': topic_info.get('topic_id', ''),
                     'topic_name': topic_info.get('topic_name', ''),
-                    'content': topic_info.get('summaries', [''])[0] if topic_info.get('summaries') else '',
-                    'sender': topic_info.get('group_info', {}).get('group_name', ''),
+                    'content': summaries[0] if summaries else '',
+                    'sender': group_name,
                     'score': result.get('confidence', 0.5),
                     'search_type': 'ai',
                     'priority': topic_info.get('priority', '中'),
-                    'group_name': topic_info.get('group_info', {}).get('group_name', ''),
-                    'group_id': topic_info.get('group_info', {}).get('group_id', '')
+                    'group_name': group_name,
+                    'group_id': group_info.get('group_id', '')
                 })
 
         return converted
@@ -566,15 +708,12 @@ class FrontendManager:
         if st.checkbox("显示详细连接", key="show_connections"):
             st.write("**话题连接关系:**")
             connection_count = 0
+            get_name = self.topic_graph.topic_id_to_name.get
             for topic in topics:
-                topic_id = topic['topic_id']
-                connections = self.topic_graph.graph.get(topic_id, []) if hasattr(self.topic_graph, 'graph') else []
+                connections = self.topic_graph.adjacency(topic['topic_id'])
                 if connections:
-                    connected_names = []
-                    for conn_id in connections:
-                        conn_name = self.topic_graph.topic_id_to_name.get(conn_id, "未知话题")
-                        if conn_name:
-                            connected_names.append(conn_name)
+                    connected_names = [name for name in (get_name(conn_id, "未知话题") for conn_id in connections)
+                                       if name]
 
                     if connected_names:
                         st.write(f"- **{topic['topic_name']}** → {', '.join(connected_names)}")
@@ -592,7 +731,7 @@ class FrontendManager:
 
         # 添加节点
         for topic in topics:
-            priority_value = {"高": 100, "中": 70, "低": 40}.get(topic.get("priority", "中"), 50)
+            priority_value = _PRIORITY_NODE_SIZE.get(topic.get("priority", "中"), 50)
             G.add_node(topic['topic_id'],
                        label=topic['topic_name'],
                        size=priority_value,
@@ -601,15 +740,12 @@ class FrontendManager:
 
         # 添加边
         edge_count = 0
+        name_to_id = _topic_name_index(topics)
         for topic in topics:
             topic_id = topic['topic_id']
             for related_topic_name in topic.get("related_topics", []):
                 # 查找相关话题的ID
-                related_topic_id = None
-                for t in topics:
-                    if t['topic_name'] == related_topic_name:
-                        related_topic_id = t['topic_id']
-                        break
+                related_topic_id = name_to_id.get(related_topic_name)
 
                 if related_topic_id and related_topic_id != topic_id:
                     # 计算关系强度
@@ -629,17 +765,23 @@ class FrontendManager:
             st.info("没有可显示的话题数据")
             return
 
-        pos = nx.spring_layout(G, k=1, iterations=50)
-
-        edge_x = []
-        edge_y = []
-        edge_text = []
-        for edge in G.edges(data=True):
-            x0, y0 = pos[edge[0]]
-            x1, y1 = pos[edge[1]]
-            edge_x.extend([x0, x1, None])
-            edge_y.extend([y0, y1, None])
-            edge_text.append(edge[2].get('description', f"关联强度: {edge[2].get('weight', 0):.2f}"))
+        pos = self._compute_graph_layout(G)
+
+        # 每条边占三个位置：起点、终点、NaN断开，一次性用数组填充
+        edges = list(G.edges(data=True))
+        node_idx = {node: i for i, node in enumerate(G.nodes())}
+        pos_arr = np.array([pos[node] for node in G.nodes()], dtype=float)
+        src = np.fromiter((node_idx[edge[0]] for edge in edges), dtype=np.intp, count=len(edges))
+        dst = np.fromiter((node_idx[edge[1]] for edge in edges), dtype=np.intp, count=len(edges))
+        edge_x = np.empty(3 * len(edges))
+        edge_y = np.empty(3 * len(edges))
+        edge_x[0::3] = pos_arr[src, 0]
+        edge_x[1::3] = pos_arr[dst, 0]
+        edge_x[2::3] = np.nan
+        edge_y[0::3] = pos_arr[src, 1]
+        edge_y[1::3] = pos_arr[dst, 1]
+        edge_y[2::3] = np.nan
+        edge_text = [edge[2].get('description', f"关联强度: {edge[2].get('weight', 0):.2f}") for edge in edges]
 
         edge_trace = go.Scatter(
             x=edge_x, y=edge_y,
@@ -648,34 +790,25 @@ class FrontendManager:
             text=edge_text,
             mode='lines')
 
-        node_x = []
-        node_y = []
-        node_text = []
-        node_size = []
-        node_color = []
-        for node in G.nodes():
-            x, y = pos[node]
-            node_x.append(x)
-            node_y.append(y)
-            node_info = G.nodes[node]
-            display_summary = node_info['summary'][:50] + "..." if len(node_info['summary']) > 50 else node_info[
-                'summary']
-            node_text.append(f"{node_info['label']}<br>优先级: {node_info['priority']}<br>摘要: {display_summary}")
-            node_size.append(node_info['size'])
-
-            # 根据优先级设置颜色
-            priority_color = {
-                "高": '#FF6B6B',
-                "中": '#4ECDC4',
-                "低": '#45B7D1'
-            }
-            node_color.append(priority_color.get(node_info['priority'], '#45B7D1'))
+        # 一次遍历取出节点属性，再批量构建Plotly所需的并行列表
+        node_data = list(G.nodes(data=True))
+        node_x = [pos[node][0] for node, _ in node_data]
+        node_y = [pos[node][1] for node, _ in node_data]
+        labels = [info['label'] for _, info in node_data]
+        priorities = [info['priority'] for _, info in node_data]
+        node_size = [info['size'] for _, info in node_data]
+        summaries = [s[:50] + "..." if len(s) > 50 else s for s in (info['summary'] for _, info in node_data)]
+        node_text = [f"{label}<br>优先级: {priority}<br>摘要: {summary}"
+                     for label, priority, summary in zip(labels, priorities, summaries)]
+
+        # 根据优先级设置颜色
+        node_color = [_PRIORITY_COLOR.get(priority, '#45B7D1') for priority in priorities]
 
         node_trace = go.Scatter(
             x=node_x, y=node_y,
             mode='markers+text',
             hoverinfo='text',
-            text=[G.nodes[node]['label'] for node in G.nodes()],
+            text=labels,
             textposition="middle center",
             marker=dict(
                 size=node_size,
@@ -705,6 +838,17 @@ class FrontendManager:
         # 图例说明
         st.info("💡 **图解**: 节点大小表示话题优先级，连线表示话题之间的关联关系，连线越粗表示关系强度越大")
 
+    def _compute_graph_layout(self, G):
+        """计算节点布局，优先使用igraph的C实现，不可用时退回networkx"""
+        if not IGRAPH_AVAILABLE:
+            return nx.spring_layout(G, k=1, iterations=50)
+
+        node_list = list(G.nodes())
+        node_idx = {node: i for i, node in enumerate(node_list)}
+        g = ig.Graph(n=len(node_list), edges=[(node_idx[u], node_idx[v]) for u, v in G.edges()])
+        layout = g.layout_fruchterman_reingold(niter=50)
+        return {node_list[i]: tuple(layout[i]) for i in range(len(node_list))}
+
     def _show_graph_statistics(self, topics, group_name):
         """显示图结构统计信息"""
         if not topics:
@@ -715,28 +859,24 @@ class FrontendManager:
             total_topics = len(topics)
 
             # 计算优先级分布
-            priority_count = {"高": 0, "中": 0, "低": 0}
-            for topic in topics:
-                priority = topic.get('priority', '中')
-                priority_count[priority] = priority_count.get(priority, 0) + 1
+            priority_count = Counter(topic.get('priority', '中') for topic in topics)
 
             total_connections = 0
             connection_pairs = set()
+            name_to_id = _topic_name_index(topics)
 
             for topic in topics:
                 topic_id = topic['topic_id']
                 for related_topic_name in topic.get('related_topics', []):
                     # 查找相关话题ID
-                    for t in topics:
-                        if t['topic_name'] == related_topic_name:
-                            related_topic_id = t['topic_id']
-                            # 创建连接对，确保总是按字母顺序排序，避免重复计数
-                            if topic_id < related_topic_id:
-                                pair = (topic_id, related_topic_id)
-                            else:
-                                pair = (related_topic_id, topic_id)
-                            connection_pairs.add(pair)
-                            break
+                    related_topic_id = name_to_id.get(related_topic_name)
+                    if related_topic_id is not None:
+                        # 创建连接对，确保总是按字母顺序排序，避免重复计数
+                        if topic_id < related_topic_id:
+                            pair = (topic_id, related_topic_id)
+                        else:
+                            pair = (related_topic_id, topic_id)
+                        connection_pairs.add(pair)
 
             total_connections = len(connection_pairs)
 
@@ -752,13 +892,9 @@ class FrontendManager:
 
             # 显示简单的优先级计数文本
             st.write("**话题优先级:**")
-            cols = st.columns(3)
-            with cols[0]:
-                st.metric("高优先级", priority_count.get("高", 0))
-            with cols[1]:
-                st.metric("中优先级", priority_count.get("中", 0))
-            with cols[2]:
-                st.metric("低优先级", priority_count.get("低", 0))
+            for col, priority in zip(st.columns(3), _PRIORITY_KEYS):
+                with col:
+                    st.metric(f"{priority}优先级", priority_count[priority])
 
         except Exception as e:
             st.error(f"显示统计信息失败: {str(e)}")
@@ -862,8 +998,28 @@ class FrontendManager:
             return
 
         st.markdown("### 已分析的群聊列表")
+        pretty_export = st.checkbox("导出时格式化JSON（文件更大）", key="export_pretty")
 
-        for i, group in enumerate(data["chat_groups"]):
+        # 按名称筛选并分页，只为当前页的群聊创建组件
+        group_filter = st.text_input("按群聊名称筛选", key="manage_group_filter").strip().casefold()
+        groups = data["chat_groups"]
+        if group_filter:
+            groups = [group for group in groups if group_filter in group['group_name'].casefold()]
+
+        if not groups:
+            st.info("没有匹配的群聊")
+
+        page_count = max(1, (len(groups) + _GROUPS_PER_PAGE - 1) // _GROUPS_PER_PAGE)
+        page = 1
+        if page_count > 1:
+            # 筛选后页数变少时，先把已保存的页码收回到有效范围
+            if st.session_state.get("manage_group_page", 1) > page_count:
+                st.session_state.manage_group_page = page_count
+            page = st.number_input(f"页码（共 {page_count} 页）", min_value=1, max_value=page_count,
+                                   step=1, key="manage_group_page")
+        start = (page - 1) * _GROUPS_PER_PAGE
+
+        for i, group in enumerate(groups[start:start + _GROUPS_PER_PAGE], start):
             with st.expander(f"{group['group_name']} (ID: {group['group_id']}, {len(group.get('topics', []))}个话题)"):
                 col1, col2, col3 = st.columns([3, 1, 1])
 
@@ -880,14 +1036,10 @@ class FrontendManager:
                 with col3:
                     if st.button("导出数据",
                                  key=f"export_{group['group_id']}_{i}"):
-                        self._export_group_data(group)
+                        self._export_group_data(group, pretty=pretty_export)
 
         if st.session_state.selected_group_for_deletion:
-            group_to_delete = None
-            for group in data["chat_groups"]:
-                if group["group_id"] == st.session_state.selected_group_for_deletion:
-                    group_to_delete = group
-                    break
+            group_to_delete = st.session_state.group_by_id.get(st.session_state.selected_group_for_deletion)
 
             if group_to_delete:
                 st.markdown("---")
@@ -938,17 +1090,25 @@ class FrontendManager:
             else:
                 st.session_state.current_group = None
 
-        # 重新构建话题映射
-        self._build_topic_mapping()
+        mapping_current = st.session_state.topic_mapping_version == st.session_state.data_version
 
         # 保存到文件
         self._save_data_to_files()
 
+        # 映射原本是最新的，只需移除被删除群聊的话题；否则留给下次运行全量重建
+        if mapping_current:
+            self._remove_group_from_mapping(group_id)
+            st.session_state.topic_mapping_version = st.session_state.data_version
+
     def _delete_all_data(self):
         """删除所有分析数据"""
         st.session_state.analysis_data = {"chat_groups": []}
         st.session_state.current_group = None
         st.session_state.topic_mapping = {}
+        st.session_state.group_topic_ids = {}
+        st.session_state.group_by_id = {}
+        st.session_state.topic_by_id = {}
+        self._mark_data_changed()
 
         # 清空文件
         data_files = [
@@ -958,20 +1118,27 @@ class FrontendManager:
         ]
 
         for file_path in data_files:
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    # 重新创建空文件
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        json.dump({"chat_groups": []}, f)
-                except:
-                    pass
+            if not os.path.exists(file_path):
+                continue
+            try:
+                # 已经是空数据则无需重写
+                if os.path.getsize(file_path) == len(_EMPTY_DATA_JSON):
+                    with open(file_path, 'rb') as f:
+                        if f.read() == _EMPTY_DATA_JSON:
+                            continue
+                # 先写临时文件再替换，读取方不会看到文件缺失或写了一半的状态
+                tmp_path = file_path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(_EMPTY_DATA_JSON)
+                os.replace(tmp_path, file_path)
+            except OSError as e:
+                print(f"❌ 清空数据文件失败 {file_path}: {e}")
 
         # 重新初始化模块
         self.init_modules()
 
-    def _export_group_data(self, group):
-        """导出群聊数据"""
+    def _export_group_data(self, group, pretty=False):
+        """导出群聊数据，默认输出紧凑JSON"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"group_export_{group['group_name']}_{timestamp}.json"
 
@@ -983,18 +1150,22 @@ class FrontendManager:
         # 下载按钮
         st.download_button(
             label="📥 下载数据",
-            data=json.dumps(export_data, ensure_ascii=False, indent=2),
+            data=_dump_json_bytes(export_data, pretty=pretty),
             file_name=filename,
             mime="application/json"
         )
 
     def load_data(self):
         """加载分析数据"""
+        if self._data is not None:
+            return self._data
+
         if st.session_state.analysis_data is not None:
-            return st.session_state.analysis_data
+            self._data = st.session_state.analysis_data
+            return self._data
 
         # 如果没有分析数据，显示空状态
-        return {
+        self._data = {
             "analysis_info": {
                 "total_messages": 0,
                 "participants": 0,
@@ -1004,21 +1175,51 @@ class FrontendManager:
             },
             "chat_groups": []
         }
+        return self._data
 
     def _build_topic_mapping(self):
-        """构建话题ID到话题名称的映射关系"""
-        topic_mapping = {}
+        """全量构建话题ID到话题名称的映射关系"""
+        st.session_state.topic_mapping = {}
+        st.session_state.group_topic_ids = {}
+        st.session_state.group_by_id = {}
+        st.session_state.topic_by_id = {}
         if st.session_state.analysis_data:
             for group in st.session_state.analysis_data.get("chat_groups", []):
-                for topic in group.get("topics", []):
-                    topic_mapping[topic["topic_id"]] = {
-                        "name": topic["topic_name"],
-                        "group_id": group["group_id"],
-                        "group_name": group["group_name"]
-                    }
-        st.session_state.topic_mapping = topic_mapping
-
-    def render_sidebar(self):
+                self._add_group_to_mapping(group)
+        st.session_state.topic_mapping_version = st.session_state.data_version
+
+    def _add_group_to_mapping(self, group):
+        """将单个群聊的话题加入映射；群聊ID重复时保留前面同ID群聊的话题，与全量遍历结果一致"""
+        topic_mapping = st.session_state.topic_mapping
+        topic_by_id = st.session_state.topic_by_id
+        topic_ids = []
+        for topic in group.get("topics", []):
+            topic_mapping[topic["topic_id"]] = {
+                "name": topic["topic_name"],
+                "group_id": group["group_id"],
+                "group_name": group["group_name"]
+            }
+            topic_by_id[topic["topic_id"]] = (topic, group)
+            topic_ids.append(topic["topic_id"])
+        st.session_state.group_topic_ids.setdefault(group["group_id"], []).extend(topic_ids)
+        # 与原先的线性查找一致，群聊ID重复时返回第一个
+        st.session_state.group_by_id.setdefault(group["group_id"], group)
+
+    def _remove_group_from_mapping(self, group_id):
+        """从映射中移除单个群聊的话题，只遍历该群聊自己的话题"""
+        topic_mapping = st.session_state.topic_mapping
+        topic_by_id = st.session_state.topic_by_id
+        for topic_id in st.session_state.group_topic_ids.pop(group_id, []):
+            topic_mapping.pop(topic_id, None)
+            topic_by_id.pop(topic_id, None)
+        st.session_state.group_by_id.pop(group_id, None)
+
+    def _ensure_topic_mapping(self):
+        """仅在分析数据版本变化时重建话题映射"""
+        if st.session_state.topic_mapping_version != st.session_state.data_version:
+            self._build_topic_mapping()
+
+    def render_sidebar(self, data):
         """渲染侧边栏"""
         st.sidebar.title("💬 群聊分析系统")
         st.sidebar.markdown("---")
@@ -1029,8 +1230,8 @@ class FrontendManager:
         st.sidebar.markdown("---")
 
         # 数据源状态显示
+        groups = data.get("chat_groups", [])
         if st.session_state.analysis_data is not None:
-            groups = st.session_state.analysis_data.get("chat_groups", [])
             if groups:
                 st.sidebar.success(f"✅ 已分析 {len(groups)} 个群聊")
             else:
@@ -1041,8 +1242,6 @@ class FrontendManager:
             st.sidebar.info("📋 请上传聊天记录文件进行分析")
 
         # 群聊选择
-        data = self.load_data()
-        groups = data.get("chat_groups", [])
         if len(groups) > 1:
             st.sidebar.markdown("### 👥 选择群聊")
             group_options = [f"{group['group_name']} ({len(group.get('topics', []))}个话题)" for group in groups]
@@ -1083,6 +1282,10 @@ class FrontendManager:
             st.session_state.edit_mode = False
             st.session_state.current_group = None
             st.session_state.topic_mapping = {}
+            st.session_state.group_topic_ids = {}
+            st.session_state.group_by_id = {}
+            st.session_state.topic_by_id = {}
+            self._mark_data_changed()
             st.session_state.data_file = None
             st.session_state.custom_group_name = ""
             st.session_state.selected_group_for_deletion = None
@@ -1111,16 +1314,10 @@ class FrontendManager:
         if not data.get("chat_groups"):
             return
 
-        # 计算统计信息
-        total_messages = 0
-        total_topics = 0
-        all_topics = []
-
-        for group in data["chat_groups"]:
-            for topic in group.get("topics", []):
-                total_topics += 1
-                total_messages += len(topic.get("related_records", []))
-                all_topics.append(topic['topic_name'])
+        # 计算统计信息（数据版本不变时直接复用）
+        overview_stats = self._get_overview_stats(data["chat_groups"])
+        total_messages = overview_stats["total_messages"]
+        total_topics = overview_stats["total_topics"]
 
         # 关键指标卡片
         col1, col2 = st.columns(2)
@@ -1134,17 +1331,12 @@ class FrontendManager:
 
         # 群聊概览
         st.subheader("👥 群聊概览")
-        for group in data["chat_groups"]:
+        for group, priority_count in zip(data["chat_groups"], overview_stats["group_priority_counts"]):
             with st.expander(f"{group['group_name']} ({len(group.get('topics', []))}个话题)"):
                 st.write(f"**描述**: {group.get('description', '暂无描述')}")
                 st.write(f"**群聊ID**: {group['group_id']}")
 
                 # 话题优先级统计
-                priority_count = {"高": 0, "中": 0, "低": 0}
-                for topic in group.get("topics", []):
-                    priority = topic.get("priority", "中")
-                    priority_count[priority] = priority_count.get(priority, 0) + 1
-
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     st.metric("高优先级", priority_count["高"])
@@ -1194,11 +1386,13 @@ class FrontendManager:
         current_topics = []
 
         if current_group_id:
-            for group in data["chat_groups"]:
-                if group["group_id"] == current_group_id:
-                    current_topics = group.get("topics", [])
-                    st.caption(f"当前群聊: {group['group_name']} ({len(current_topics)}个话题)")
-                    break
+            group = st.session_state.group_by_id.get(current_group_id)
+            if group is not None:
+                current_topics = group.get("topics", [])
+                st.caption(f"当前群聊: {group['group_name']} ({len(current_topics)}个话题)")
+
+        # 话题索引的缓存范围：当前群聊或全部群聊
+        topics_scope = current_group_id if current_topics else None
 
         if not current_topics:
             # 如果没有选择特定群聊或群聊没有话题，显示所有话题
@@ -1221,53 +1415,75 @@ class FrontendManager:
         with col2:
             sort_by = st.selectbox("排序方式", ["优先级降序", "相关记录数降序", "名称排序"], key="topic_sort")
 
-        # 过滤话题
-        filtered_topics = []
-        for topic in current_topics:
-            # 优先级筛选
-            topic_priority = topic.get("priority", "中")
-            if priority_filter and topic_priority not in priority_filter:
-                continue
-
-            # 关键词筛选
-            if search_term:
-                search_lower = search_term.lower()
-                name_match = search_lower in topic['topic_name'].lower()
-                summary_match = False
-                for summary in topic.get("summaries", []):
-                    if search_lower in summary.lower():
-                        summary_match = True
-                        break
-                if not (name_match or summary_match):
-                    continue
-
-            filtered_topics.append(topic)
+        # 过滤话题（名称和摘要已在索引中预先转为小写）
+        topic_index = self._get_topic_index(current_topics, topics_scope)
+        search_cf = search_term.casefold() if search_term else ""
+        # 关键词中有话题不包含的字符时，签名按位与即可排除，无需做子串匹配
+        search_sig = _char_signature(search_cf)
+        priority_set = frozenset(priority_filter) if priority_filter else None
+        filtered_entries = [
+            entry for entry in topic_index
+            if (priority_set is None or entry["priority"] in priority_set)
+            and (not search_cf or ((entry["sig"] & search_sig) == search_sig
+                                   and (search_cf in entry["name_cf"] or search_cf in entry["summary_cf"])))
+        ]
 
-        if not filtered_topics:
+        if not filtered_entries:
             st.warning("没有找到符合条件的的话题")
             return
 
-        # 排序
+        # 排序（使用索引中预先计算的排序键）
         if sort_by == "优先级降序":
-            priority_order = {"高": 3, "中": 2, "低": 1}
-            filtered_topics.sort(key=lambda x: priority_order.get(x.get("priority", "中"), 0), reverse=True)
+            filtered_entries.sort(key=lambda entry: entry["priority_rank"], reverse=True)
         elif sort_by == "相关记录数降序":
-            filtered_topics.sort(key=lambda x: len(x.get("related_records", [])), reverse=True)
+            filtered_entries.sort(key=lambda entry: entry["record_count"], reverse=True)
         elif sort_by == "名称排序":
-            filtered_topics.sort(key=lambda x: x['topic_name'])
+            filtered_entries.sort(key=lambda entry: entry["topic"]['topic_name'])
 
-        # 显示统计信息
-        priority_count = {"高": 0, "中": 0, "低": 0}
-        for topic in filtered_topics:
-            priority = topic.get("priority", "中")
-            priority_count[priority] = priority_count.get(priority, 0) + 1
+        filtered_topics = [entry["topic"] for entry in filtered_entries]
 
+        # 显示统计信息
         st.write(f"显示 {len(filtered_topics)} 个话题")
 
         # 显示话题列表
         for i, topic in enumerate(filtered_topics):
             self._render_topic_card(topic, i)
 
+    def _get_overview_stats(self, chat_groups):
+        """获取概览统计，数据版本不变时直接复用上次的结果"""
+        cached = st.session_state.overview_stats
+        if cached is not None and cached[0] == st.session_state.data_version:
+            return cached[1]
+
+        overview_stats = _compute_overview_stats(chat_groups)
+        st.session_state.overview_stats = (st.session_state.data_version, overview_stats)
+        return overview_stats
+
+    def _get_topic_index(self, topics, scope):
+        """构建话题筛选/排序索引，数据版本和范围不变时直接复用"""
+        cache_key = (st.session_state.data_version, scope)
+        cached = st.session_state.topic_index
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
+
+        topic_index = []
+        for topic in topics:
+            priority = topic.get("priority", "中")
+            name_cf = topic['topic_name'].casefold()
+            summary_cf = "\n".join(topic.get("summaries", [])).casefold()
+            topic_index.append({
+                "topic": topic,
+                "priority": priority,
+                "priority_rank": _PRIORITY_ORDER.get(priority, 0),
+                "record_count": len(topic.get("related_records", [])),
+                "name_cf": name_cf,
+                "summary_cf": summary_cf,
+                "sig": _char_signature(name_cf) | _char_signature(summary_cf)
+            })
+
+        st.session_state.topic_index = (cache_key, topic_index)
+        return topic_index
+
     def _render_add_topic_form(self, data):
         """渲染添加话题表单"""
         st.markdown("---")
@@ -1343,11 +1559,9 @@ class FrontendManager:
                             st.success(f"话题添加成功！ID: {topic_id}")
 
                             # 从topic_graph中重新加载数据到session state
+                            # （群聊对象整体替换为话题图中的对象，映射和索引在下次运行时按版本重建）
                             self._sync_data_from_topic_graph()
 
-                            # 重新构建话题映射
-                            self._build_topic_mapping()
-
                             # 保存到文件
                             self._save_data_to_files()
 
@@ -1391,12 +1605,7 @@ class FrontendManager:
     def _render_topic_card(self, topic, index):
         """渲染单个话题卡片"""
         # 根据优先级设置颜色
-        priority_color = {
-            "高": "#FF6B6B",
-            "中": "#4ECDC4",
-            "低": "#45B7D1"
-        }
-        color = priority_color.get(topic.get("priority", "中"), "#45B7D1")
+        color = _PRIORITY_COLOR.get(topic.get("priority", "中"), "#45B7D1")
 
         is_expanded = topic['topic_id'] == st.session_state.current_topic
 
@@ -1487,22 +1696,7 @@ class FrontendManager:
             # 显示相关聊天记录
             if topic.get("related_records"):
                 st.write("**相关聊天记录:**")
-                for record in topic.get("related_records", []):
-                    if isinstance(record, str):
-                        if "：" in record:
-                            parts = record.split("：", 1)
-                            if len(parts) == 2:
-                                st.write(f"**{parts[0]}**: {parts[1]}")
-                            else:
-                                st.write(f"{record}")
-                        elif ":" in record:
-                            parts = record.split(":", 1)
-                            if len(parts) == 2:
-                                st.write(f"**{parts[0]}**: {parts[1]}")
-                            else:
-                                st.write(f"{record}")
-                        else:
-                            st.write(f"{record}")
+                self._render_records(topic["related_records"])
 
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -1610,16 +1804,10 @@ class FrontendManager:
                                     st.divider()
 
                             # 获取话题详情
-                            topic = None
-                            for group in data.get("chat_groups", []):
-                                for t in group.get("topics", []):
-                                    if t["topic_id"] == topic_id:
-                                        topic = t
-                                        break
-                                if topic:
-                                    break
-
-                            if topic:
+                            topic_entry = st.session_state.topic_by_id.get(topic_id)
+
+                            if topic_entry:
+                                topic = topic_entry[0]
                                 with st.expander("📖 查看聊天记录详情", expanded=False):
                                     self._render_search_topic_records(topic)
 
@@ -1639,30 +1827,37 @@ class FrontendManager:
         # 显示相关聊天记录
         if topic.get("related_records"):
             st.write("**相关聊天记录:**")
-            for record in topic.get("related_records", []):
-                if isinstance(record, str):
-                    if "：" in record:
-                        parts = record.split("：", 1)
-                        if len(parts) == 2:
-                            st.write(f"**{parts[0]}**: {parts[1]}")
-                        else:
-                            st.write(f"{record}")
-                    elif ":" in record:
-                        parts = record.split(":", 1)
-                        if len(parts) == 2:
-                            st.write(f"**{parts[0]}**: {parts[1]}")
-                        else:
-                            st.write(f"{record}")
-                    else:
-                        st.write(f"{record}")
+            self._render_records(topic["related_records"])
+
+    def _format_record(self, record):
+        """拆分聊天记录为 (发言人, 内容)，无法识别发言人时返回 (None, 原记录)"""
+        for separator in _RECORD_SEPARATORS:
+            speaker, found, content = record.partition(separator)
+            if found:
+                return speaker, content
+        return None, record
+
+    def _render_records(self, records):
+        """渲染聊天记录，发言人加粗显示；所有记录合并为一次markdown输出"""
+        lines = []
+        for record in records:
+            if isinstance(record, str):
+                speaker, content = self._format_record(record)
+                if speaker is not None:
+                    lines.append(f"**{speaker}**: {content}")
+                else:
+                    lines.append(record)
+        if lines:
+            st.markdown("\n\n".join(lines))
 
     def run(self):
         """运行主应用"""
         # 加载数据
         data = self.load_data()
+        self._ensure_topic_mapping()
 
         # 渲染侧边栏并获取当前页面
-        page, priority_filter = self.render_sidebar()
+        page, priority_filter = self.render_sidebar(data)
 
         # 根据选择渲染不同页面
         if page == "📊 分析概览":
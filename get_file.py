@@ -1,5 +1,16 @@
+import io
+
 import streamlit as st
 from docx import Document
+
+
+@st.cache_data(show_spinner=False)
+def _extract_docx_text(file_bytes: bytes) -> str:
+    # 按文件内容缓存解析结果，页面重跑时不再重复解析
+    doc = Document(io.BytesIO(file_bytes))
+    return '\n'.join(paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip())
+
+
 uploaded_file = st.file_uploader(
     label="Upload a file",
     type=["docx"],
@@ -9,10 +20,5 @@ if uploaded_file is not None:
     st.write(f"文件名:{uploaded_file.name}")
     st.write(f"文件大小:{uploaded_file.size}")
     st.write(f"文件类型：{uploaded_file.type}")
-    if uploaded_file.type=="docx":
-        doc = Document(uploaded_file)
-        full_text=[]
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                full_text.append(paragraph.text)
-        doc_content='\n'.join(full_text)
\ No newline at end of file
+    if uploaded_file.name.lower().endswith(".docx"):
+        doc_content = _extract_docx_text(uploaded_file.getvalue())
\ No newline at end of file
@@ -1,21 +1,261 @@
+import functools
+import inspect
 import json
-from typing import Dict, List, Tuple, Any, Optional
-import time
+import mmap
+import os
+import re
+import sys
+from array import array
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Dict, List, Set, Tuple, Any, Optional
 import threading
+import warnings
+
+try:
+    import orjson  # 可选：C实现的JSON解析/序列化
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+# 紧凑格式中话题的列顺序，键名只在文件头写一次
+_TOPIC_SCHEMA = ("topic_id", "topic_name", "priority", "summaries", "related_records", "related_topics")
+_TOPIC_SCHEMA_KEYS = frozenset(_TOPIC_SCHEMA)
+
+# 批量添加话题时各字段要求的类型，缺省字段使用默认值
+_TOPIC_FIELD_TYPES = {
+    "topic_id": str,
+    "topic_name": str,
+    "priority": str,
+    "summaries": list,
+    "related_records": list,
+    "related_topics": list
+}
+_REQUIRED_TOPIC_FIELDS = ("topic_id", "topic_name")
+
+# 延迟保存失败后自动重试的最多次数，之后需调用方显式 flush()
+_MAX_SAVE_RETRIES = 3
+
+# 优先级排序顺序，未知优先级按"中"处理
+_PRIORITY_ORDER = {"高": 3, "中": 2, "低": 1}
+
+
+def _validate_topic_data(topic: Any) -> Optional[str]:
+    """检查一条话题数据的字段，返回错误信息，合法时返回None"""
+    if not isinstance(topic, dict):
+        return "话题数据必须是字典"
+    for field in _REQUIRED_TOPIC_FIELDS:
+        if field not in topic:
+            return f"话题缺少字段 {field}"
+    for field, field_type in _TOPIC_FIELD_TYPES.items():
+        if field in topic and not isinstance(topic[field], field_type):
+            return f"话题字段 {field} 类型应为 {field_type.__name__}"
+        if field_type is list and field in topic and not all(isinstance(item, str) for item in topic[field]):
+            return f"话题字段 {field} 的元素必须是字符串"
+    return None
+
+
+# 批量命令文件中允许调用的修改方法及其参数类型，(list, str) 表示字符串列表
+_BATCH_ARG_TYPES = {
+    "add_topic_simple": {"group_id": str, "topic_name": str, "priority": str, "description": str,
+                         "related_topics": (list, str)},
+    "add_topic_complete": {"group_id": str},  # 话题字段由 _validate_topic_data 检查
+    "add_topics": {"group_id": str, "topics": list},
+    "add_chat_records": {"topic_id": str, "new_records": (list, str)},
+    "add_chat_records_bulk": {"updates": dict},
+    "add_summary": {"topic_id": str, "new_summary": str},
+    "add_related_topic": {"topic_id": str, "related_topic_name": str}
+}
+
+
+def _validate_batch_arguments(method_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+    """在执行前检查批量命令的参数，返回错误信息，合法时返回None"""
+    arg_types = _BATCH_ARG_TYPES[method_name]
+    for name, value in arguments.items():
+        expected = arg_types.get(name)
+        if expected is None:
+            continue
+        container_type, item_type = expected if isinstance(expected, tuple) else (expected, None)
+        if not isinstance(value, container_type):
+            return f"参数 {name} 类型应为 {container_type.__name__}"
+        if item_type is not None and not all(isinstance(item, item_type) for item in value):
+            return f"参数 {name} 的元素必须是字符串"
+
+    if method_name == "add_topic_complete":
+        return _validate_topic_data({name: value for name, value in arguments.items() if name != "group_id"})
+    if method_name == "add_topics":
+        for topic in arguments["topics"]:
+            error = _validate_topic_data(topic)
+            if error:
+                return error
+    if method_name == "add_chat_records_bulk":
+        for topic_id, records in arguments["updates"].items():
+            if not isinstance(records, list) or not all(isinstance(record, str) for record in records):
+                return f"话题 {topic_id} 的聊天记录必须是字符串列表"
+    return None
+
+# 倒排索引的分词规则
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _pack_chat_groups(chat_groups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """把话题转换为按 _TOPIC_SCHEMA 排列的值列表，含其他字段的话题保持原样"""
+    packed_groups = []
+    for group in chat_groups:
+        packed_group = dict(group)
+        packed_group['topics'] = [
+            [topic[key] for key in _TOPIC_SCHEMA] if topic.keys() == _TOPIC_SCHEMA_KEYS else topic
+            for topic in group.get('topics', [])
+        ]
+        packed_groups.append(packed_group)
+    return packed_groups
+
+
+def _dumps_line(data: Any) -> bytes:
+    """序列化为一行UTF-8编码的JSON（含换行符），优先使用orjson"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data) + b'\n'
+    return (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _loads(content: bytes) -> Any:
+    """解析UTF-8编码的JSON，优先使用orjson"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _load_json_file(path: str) -> Any:
+    """读取并解析JSON文件；有orjson时直接解析文件的内存映射，不再把整个文件复制成bytes"""
+    with open(path, 'rb') as f:
+        if ORJSON_AVAILABLE:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空文件无法映射，交给解析器报错
+                return _loads(f.read())
+            with mapped:
+                view = memoryview(mapped)
+                try:
+                    return orjson.loads(view)
+                finally:
+                    view.release()
+        return _loads(f.read())
+
+
+def _unpack_chat_groups(schema: List[str], chat_groups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """把紧凑格式的话题值列表还原为字典"""
+    for group in chat_groups:
+        group['topics'] = [
+            dict(zip(schema, topic)) if isinstance(topic, list) else topic
+            for topic in group.get('topics', [])
+        ]
+    return chat_groups
+
+
+class _RWLock:
+    """读写锁：读操作可以并发，写操作独占；持有写锁的线程可以再次获取读锁或写锁"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0  # 正在读的线程数
+        self._writer: Optional[int] = None  # 持有写锁的线程ID
+        self._write_depth = 0  # 写锁重入层数
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        with self._cond:
+            # 写锁持有者在自己的写操作中读取时直接放行
+            counted = self._writer != me
+            if counted:
+                while self._writer is not None:
+                    self._cond.wait()
+                self._readers += 1
+        try:
+            yield
+        finally:
+            if counted:
+                with self._cond:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._writer = me
+            self._write_depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+def _read_locked(method):
+    """在读锁内执行的方法"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._rwlock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _write_locked(method):
+    """在写锁内执行的方法"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._rwlock.write():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class TopicGraph:
     """话题图结构 """
 
-    def __init__(self, json_file: str = None, auto_cleanup_days: int = 30):
+    def __init__(self, json_file: str = None, auto_cleanup_days: int = 30, op_log: bool = False,
+                 save_delay: float = 0):
+        self._rwlock = _RWLock()  # 清理线程、延迟保存与调用方并发访问时保护下面的数据
+        self._lazy_lock = threading.Lock()  # 读锁下按需构建连接和搜索索引时，保证只构建一次
         self.chat_groups: List[Dict[str, Any]] = []  # 聊天群组存储
-        self.graph: Dict[str, List[str]] = {}  # 图结构存储（简化版，只存储连接关系）
+        self._graph: Dict[str, Set[str]] = {}  # 图结构存储（简化版，只存储连接关系），通过 graph 属性访问
+        self._pending_relations: List[Tuple[str, List[str]]] = []  # 尚未解析成边的 (话题ID, 相关话题名称列表)
         self.topic_id_to_name: Dict[str, str] = {}  # 话题ID到名称的映射
         self.topic_name_to_id: Dict[str, str] = {}  # 话题名称到ID的映射
+        self.topic_id_to_topic: Dict[str, Dict[str, Any]] = {}  # 话题ID到话题数据的索引
+        self.group_id_to_group: Dict[str, Dict[str, Any]] = {}  # 群组ID到群组数据的索引
+        self._search_index: Optional[List[Tuple[str, str, Dict, Dict]]] = None  # 搜索用的小写文本，按需构建
+        self._token_index: Dict[str, Set[int]] = {}  # 词到 _search_index 下标的倒排索引
+        self._bigram_index: Dict[str, Set[int]] = {}  # 相邻两字符到 _search_index 下标的倒排索引，用于子串搜索
+        self._sorted_topics: Optional[List[Tuple[str, str, str]]] = None  # 按优先级排好序的话题，按需构建
+        self._record_sets: Dict[str, Set[str]] = {}  # 话题ID到已有聊天记录的集合，首次添加时构建，用于去重
+        self._summary_sets: Dict[str, Set[str]] = {}  # 话题ID到已有总结的集合，首次添加时构建，用于去重
+        self._incoming_related: Dict[str, Set[str]] = {}  # 话题名称到把它列为相关话题的话题ID
+        self._topic_count = 0  # 话题总数，随加载和添加同步更新
+        self._edge_count = 0  # 已建立的连接数（无向边），随建边同步更新
+        self._file_signature: Optional[Tuple[str, int, int]] = None  # 内存数据对应的文件 (路径, 修改时间, 大小)
         self.json_file = json_file
+        self.compact_json = False  # 是否以紧凑格式（话题键名只写一次）保存
+        self.op_log = op_log  # 修改时只向 <json_file>.log 追加一行操作，而不是重写整个文件
+        self._log_snapshot: Optional[List[int]] = None  # 操作日志所基于的快照文件 [修改时间, 大小]
+        self.save_delay = save_delay  # 大于0时修改后延迟这么多秒再保存，期间的连续修改合并为一次写入
+        self._dirty = False  # 是否有尚未写回文件的修改
+        self._save_timer: Optional[threading.Timer] = None  # 延迟保存的定时器
+        self._save_failures = 0  # 延迟保存连续失败的次数
+        self._save_lock = threading.Lock()  # 保护 _dirty、_save_failures 和 _save_timer
         self.auto_cleanup_days = auto_cleanup_days  # 自动清理天数
         self.cleanup_thread = None  # 定期清理线程
-        self.running = True  # 控制清理线程运行
+        self._stop_event = threading.Event()  # 通知清理线程退出，可立即打断等待
 
         if json_file:
             success = self.load_from_json(json_file)
@@ -28,84 +268,350 @@ class TopicGraph:
             self.chat_groups = []
             self._build_graph_from_data()
 
+    @_write_locked
     def load_from_json(self, json_file: str) -> bool:
         """从JSON文件加载，返回是否成功"""
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            file_stat = os.stat(json_file)
+        except FileNotFoundError:
+            return False
 
-            self.chat_groups = data.get('chat_groups', [])
-            self._build_graph_from_data()
+        # 文件自上次加载/保存后没有变化时，内存中的数据就是最新的，无需重新解析
+        signature = (json_file, file_stat.st_mtime_ns, file_stat.st_size)
+        if signature == self._file_signature:
             return True
+
+        try:
+            data = _load_json_file(json_file)
         except FileNotFoundError:
             return False
         except json.JSONDecodeError:
             return False
 
-    def _build_graph_from_data(self):
-        """从聊天数据构建图结构"""
-        self.graph = {}
-        self.topic_id_to_name = {}
-        self.topic_name_to_id = {}
+        self.compact_json = 'schema' in data
+        self.load_from_data(data)
+        if self.op_log and json_file == self.json_file:
+            self._log_snapshot = [file_stat.st_mtime_ns, file_stat.st_size]
+            self._replay_op_log()
+        self._file_signature = signature
+        return True
+
+    @_write_locked
+    def load_from_data(self, data: Dict[str, Any]):
+        """从内存中的数据加载（避免重新读取刚写入的文件）"""
+        self._file_signature = None
+        self._log_snapshot = None
+        if 'schema' in data:
+            self.chat_groups = _unpack_chat_groups(data['schema'], data.get('chat_groups', []))
+        else:
+            self.chat_groups = data.get('chat_groups', [])
+        self._build_graph_from_data()
+
+    @property
+    def graph(self) -> Dict[str, Set[str]]:
+        """话题邻接结构，首次访问时才解析相关话题建立连接"""
+        self._ensure_graph_built()
+        return self._graph
 
-        # 收集所有话题
+    def _build_graph_from_data(self):
+        """从聊天数据构建映射和图节点，边在首次访问 graph 时再解析"""
+        graph = self._graph = {}
+        self._edge_count = 0
+        topic_id_to_name = self.topic_id_to_name = {}
+        topic_name_to_id = self.topic_name_to_id = {}
+        topic_id_to_topic = self.topic_id_to_topic = {}
+        self._incoming_related = {}
+        group_id_to_group = self.group_id_to_group = {}
+        self._record_sets = {}
+        self._summary_sets = {}
+        self._invalidate_caches()
+        pending_relations = []  # 有相关话题的 (话题ID, 相关话题名称列表)
+        topic_count = 0
+
+        # 收集所有话题，同时记下需要建立连接的话题
+        intern = sys.intern
         for group in self.chat_groups:
+            group_id_to_group.setdefault(group['group_id'], group)
             for topic in group.get('topics', []):
                 topic_id = topic['topic_id']
                 topic_name = topic['topic_name']
 
+                # 优先级只有少数几种取值，驻留后所有话题共用同一个字符串对象
+                priority = topic.get('priority')
+                if type(priority) is str:
+                    topic['priority'] = intern(priority)
+
                 # 存储话题映射
-                self.topic_id_to_name[topic_id] = topic_name
-                self.topic_name_to_id[topic_name] = topic_id
+                topic_id_to_name[topic_id] = topic_name
+                topic_name_to_id[topic_name] = topic_id
+                # ID重复时保留第一个，与逐个遍历查找的结果一致
+                topic_id_to_topic.setdefault(topic_id, topic)
 
                 # 初始化图结构
-                self.graph[topic_id] = []
+                graph[topic_id] = set()
+                topic_count += 1
+
+                related_topics = topic.get('related_topics')
+                if related_topics:
+                    pending_relations.append((topic_id, related_topics))
+
+        self._topic_count = topic_count
+        self._pending_relations = pending_relations
+
+    def _ensure_graph_built(self):
+        """如有尚未解析的相关话题，先建立连接"""
+        if self._pending_relations:
+            with self._lazy_lock:
+                if self._pending_relations:
+                    self._resolve_pending_relations()
+
+    def _resolve_pending_relations(self):
+        """解析待处理的相关话题，建立双向连接（名称映射完整后才能解析）"""
+        pending_relations = self._pending_relations
+        graph = self._graph
+        incoming_related = self._incoming_related
+        get_topic_id = self.topic_name_to_id.get
+        for topic_id, related_topics in pending_relations:
+            for related_topic_name in related_topics:
+                incoming_related.setdefault(related_topic_name, set()).add(topic_id)
+
+            # 一次解析出该话题的全部邻居并批量并入，再补上反向连接
+            related_ids = set(map(get_topic_id, related_topics))
+            related_ids.discard(None)
+            related_ids.discard(topic_id)
+            self._edge_count += len(related_ids - graph[topic_id])
+            graph[topic_id].update(related_ids)
+            for related_topic_id in related_ids:
+                graph[related_topic_id].add(topic_id)
+        # 全部连接建好后才清空，其他读线程不会看到建了一半的图
+        self._pending_relations = []
+
+    def _index_new_topic(self, new_topic: Dict[str, Any]):
+        """把新追加的话题加入各索引并只连接它自己的边，无需重建整个图"""
+        graph = self.graph  # 先完成尚未解析的连接，反向引用表才是完整的
+        topic_id = new_topic['topic_id']
+        topic_name = new_topic['topic_name']
 
-        # 构建话题之间的连接（基于related_topics）
-        for group in self.chat_groups:
-            for topic in group.get('topics', []):
-                topic_id = topic['topic_id']
+        # 更新映射
+        self.topic_id_to_name[topic_id] = topic_name
+        self.topic_name_to_id[topic_name] = topic_id
+        self.topic_id_to_topic.setdefault(topic_id, new_topic)
+        self._invalidate_caches()
+        self._topic_count += 1
 
-                # 连接相关话题
-                for related_topic_name in topic.get('related_topics', []):
-                    # 查找相关话题的ID
-                    related_topic_id = self.topic_name_to_id.get(related_topic_name)
-                    if related_topic_id and related_topic_id != topic_id:
-                        # 添加双向连接
-                        if related_topic_id not in self.graph[topic_id]:
-                            self.graph[topic_id].append(related_topic_id)
+        # 初始化图结构
+        neighbors = graph[topic_id] = set()
 
-                        if topic_id not in self.graph[related_topic_id]:
-                            self.graph[related_topic_id].append(topic_id)
+        # 连接相关话题
+        for related_topic_name in new_topic['related_topics']:
+            self._incoming_related.setdefault(related_topic_name, set()).add(topic_id)
+            related_topic_id = self.topic_name_to_id.get(related_topic_name)
+            if related_topic_id is not None and related_topic_id != topic_id:
+                # 添加双向连接
+                neighbors.add(related_topic_id)
+                graph[related_topic_id].add(topic_id)
+
+        # 补上此前已把该名称列为相关话题、但当时还找不到对应话题的连接
+        for source_id in self._incoming_related.get(topic_name, ()):
+            if source_id != topic_id:
+                neighbors.add(source_id)
+                graph[source_id].add(topic_id)
+        self._edge_count += len(neighbors)
+
+    def _invalidate_caches(self):
+        """话题增减后清空按需构建的派生数据"""
+        self._search_index = None
+        self._sorted_topics = None
 
     def _count_topics(self):
         """计算话题总数"""
-        count = 0
-        for group in self.chat_groups:
-            count += len(group.get('topics', []))
-        return count
+        return self._topic_count
 
     def _priority_order(self, priority: str) -> int:
         """返回优先级排序顺序"""
-        priority_order = {"高": 3, "中": 2, "低": 1}
-        return priority_order.get(priority, 2)
+        return _PRIORITY_ORDER.get(priority, 2)
 
-    def save_to_json(self, json_file: str = None) -> bool:
-        """保存到JSON文件，返回是否成功"""
+    @_write_locked
+    def save_to_json(self, json_file: str = None, compact: bool = None, pretty: bool = False) -> bool:
+        """保存到JSON文件，返回是否成功；compact为None时沿用加载时的格式，pretty为True时缩进输出"""
         if json_file is None:
             json_file = self.json_file
+        if not json_file:
+            return False
+        if compact is None:
+            compact = self.compact_json
+
+        if compact:
+            data = {
+                'schema': list(_TOPIC_SCHEMA),
+                'chat_groups': _pack_chat_groups(self.chat_groups)
+            }
+        else:
+            data = {
+                'chat_groups': self.chat_groups
+            }
 
-        data = {
-            'chat_groups': self.chat_groups
-        }
-
+        # 先写临时文件再替换，写入中断时原文件保持完整
+        temp_file = json_file + '.tmp'
         try:
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            if ORJSON_AVAILABLE:
+                with open(temp_file, 'wb') as f:
+                    f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0))
+            else:
+                # json.dump 按片段边编码边写入，不会先拼出完整字符串
+                format_options = {"indent": 2} if pretty else {"separators": (",", ":")}
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, **format_options)
+            os.replace(temp_file, json_file)
+            file_stat = os.stat(json_file)
+            self._file_signature = (json_file, file_stat.st_mtime_ns, file_stat.st_size)
+            if self.op_log and json_file == self.json_file:
+                # 新快照已包含日志中的全部操作，日志从头开始记录
+                self._log_snapshot = [file_stat.st_mtime_ns, file_stat.st_size]
+                if os.path.exists(self._log_file()):
+                    os.remove(self._log_file())
             return True
         except Exception:
+            self._file_signature = None
+            self._log_snapshot = None
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
             return False
 
+    def compact(self) -> bool:
+        """把操作日志合并进快照文件并清空日志，返回是否成功"""
+        return self.save_to_json()
+
+    def _log_file(self) -> str:
+        """操作日志文件路径"""
+        return self.json_file + '.log'
+
+    def _persist(self, op: Dict[str, Any] = None):
+        """数据变更后写回文件；启用操作日志时只追加这次的操作，没有绑定文件时内存数据已与磁盘不一致"""
+        if not self.json_file:
+            self._file_signature = None
+            return
+
+        if self.op_log and op is not None and self._log_snapshot is not None:
+            try:
+                with open(self._log_file(), 'ab') as f:
+                    if f.tell() == 0:
+                        # 首行记录日志所基于的快照，快照被外部改写后旧日志不会被误回放
+                        f.write(_dumps_line({"snapshot": self._log_snapshot}))
+                    f.write(_dumps_line(op))
+                return
+            except OSError:
+                pass
+
+        if self.save_delay > 0:
+            self._schedule_save()
+        else:
+            self.save_to_json()
+
+    def _schedule_save(self):
+        """标记有未保存的修改，并把保存推迟到最后一次修改的 save_delay 秒之后"""
+        with self._save_lock:
+            self._dirty = True
+            self._save_failures = 0
+            self._start_save_timer()
+
+    def _start_save_timer(self):
+        """（重新）启动延迟保存定时器，调用方需持有 _save_lock"""
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+        # 非守护线程，进程退出前会等待尚未完成的保存
+        self._save_timer = threading.Timer(self.save_delay, self.flush)
+        self._save_timer.start()
+
+    @_write_locked
+    def flush(self) -> bool:
+        """立即写回尚未保存的修改，返回是否成功；没有待保存的修改时直接返回True"""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return True
+            self._dirty = False
+            if not self.save_to_json():
+                self._dirty = True
+                self._save_failures += 1
+                if self.save_delay > 0 and self._save_failures < _MAX_SAVE_RETRIES:
+                    # 修改仍只在内存中，稍后重试，避免没有新修改时一直不再保存
+                    self._start_save_timer()
+                else:
+                    warnings.warn(f"保存 {self.json_file} 连续失败，修改仍在内存中，请调用 flush() 重试")
+                return False
+            self._save_failures = 0
+            return True
+
+    def _replay_op_log(self):
+        """在刚加载的快照上回放操作日志，日志与快照不匹配时改名为 .stale 保留，不再回放"""
+        log_file = self._log_file()
+        try:
+            with open(log_file, 'rb') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return
+
+        try:
+            header = _loads(lines[0]) if lines else None
+        except json.JSONDecodeError:
+            header = None
+        if not isinstance(header, dict) or header.get("snapshot") != self._log_snapshot:
+            # 只凭修改时间和大小判断，快照被touch/复制/还原时也会不匹配，日志里的修改不能直接删掉
+            stale_file = log_file + '.stale'
+            suffix = 1
+            while os.path.exists(stale_file):
+                suffix += 1
+                stale_file = f"{log_file}.{suffix}.stale"
+            os.replace(log_file, stale_file)
+            warnings.warn(f"操作日志 {log_file} 与快照文件不匹配，未回放，已另存为 {stale_file}")
+            return
+
+        for line in lines[1:]:
+            try:
+                self._apply_op(_loads(line))
+            except (json.JSONDecodeError, KeyError, TypeError):
+                # 写入中断留下的残行及其后的内容不再回放，下次修改时整体重写快照
+                self._log_snapshot = None
+                break
+
+    def _apply_op(self, op: Dict[str, Any]):
+        """把一条修改操作应用到内存数据上，直接修改和回放日志共用"""
+        kind = op["op"]
+        if kind == "add_topic":
+            new_topic = op["topic"]
+            self.group_id_to_group[op["group_id"]]['topics'].append(new_topic)
+            self._index_new_topic(new_topic)
+        elif kind == "add_topics":
+            self.group_id_to_group[op["group_id"]]['topics'].extend(op["topics"])
+            self._build_graph_from_data()
+        elif kind == "add_records":
+            self.topic_id_to_topic[op["topic_id"]]['related_records'].extend(op["records"])
+        elif kind == "add_records_bulk":
+            for topic_id, records in op["updates"].items():
+                self.topic_id_to_topic[topic_id]['related_records'].extend(records)
+        elif kind == "add_summary":
+            self.topic_id_to_topic[op["topic_id"]]['summaries'].append(op["summary"])
+            self._search_index = None
+        elif kind == "add_related":
+            graph = self.graph
+            topic_id = op["topic_id"]
+            related_topic_name = op["related_topic_name"]
+            related_topic_id = self.topic_name_to_id[related_topic_name]
+            self.topic_id_to_topic[topic_id]['related_topics'].append(related_topic_name)
+            self._incoming_related.setdefault(related_topic_name, set()).add(topic_id)
+
+            # 更新图结构
+            if related_topic_id not in graph[topic_id]:
+                self._edge_count += 1
+            graph[topic_id].add(related_topic_id)
+            graph[related_topic_id].add(topic_id)
+        else:
+            raise KeyError(kind)
+
+    @_write_locked
     def add_topic_simple(self, group_id: str, topic_name: str, priority: str, description: str = "",
                          related_topics: List[str] = None) -> Tuple[bool, str]:
         """单个添加话题"""
@@ -113,17 +619,16 @@ class TopicGraph:
             related_topics = []
 
         # 查找群组
-        group = None
-        for g in self.chat_groups:
-            if g['group_id'] == group_id:
-                group = g
-                break
-
+        group = self.group_id_to_group.get(group_id)
         if not group:
             return False, f"群组 {group_id} 不存在"
 
-        # 创建新话题
-        topic_id = f"topic_{group_id}_{len(group['topics']) + 1:02d}"
+        # 创建新话题（编号已被占用时顺延，通过ID索引判断无需遍历话题）
+        sequence = len(group['topics']) + 1
+        topic_id = f"topic_{group_id}_{sequence:02d}"
+        while topic_id in self.topic_id_to_topic:
+            sequence += 1
+            topic_id = f"topic_{group_id}_{sequence:02d}"
         new_topic = {
             "topic_id": topic_id,
             "topic_name": topic_name,
@@ -133,31 +638,14 @@ class TopicGraph:
             "related_topics": related_topics
         }
 
-        group['topics'].append(new_topic)
-
-        # 更新映射
-        self.topic_id_to_name[topic_id] = topic_name
-        self.topic_name_to_id[topic_name] = topic_id
-
-        # 初始化图结构
-        self.graph[topic_id] = []
-
-        # 连接相关话题
-        for related_topic_name in related_topics:
-            related_topic_id = self.topic_name_to_id.get(related_topic_name)
-            if related_topic_id and related_topic_id != topic_id:
-                # 添加双向连接
-                if related_topic_id not in self.graph[topic_id]:
-                    self.graph[topic_id].append(related_topic_id)
-
-                if topic_id not in self.graph[related_topic_id]:
-                    self.graph[related_topic_id].append(topic_id)
+        op = {"op": "add_topic", "group_id": group_id, "topic": new_topic}
+        self._apply_op(op)
 
-        if self.json_file:
-            self.save_to_json()
+        self._persist(op)
 
         return True, topic_id
 
+    @_write_locked
     def add_topic_complete(self, group_id: str, topic_id: str, topic_name: str, priority: str,
                            summaries: List[str], related_records: List[str], related_topics: List[str]) -> Tuple[bool, str]:
         """多个添加话题"""
@@ -166,12 +654,7 @@ class TopicGraph:
             return False, f"话题ID {topic_id} 已存在，请使用不同的ID"
 
         # 查找群组
-        group = None
-        for g in self.chat_groups:
-            if g['group_id'] == group_id:
-                group = g
-                break
-
+        group = self.group_id_to_group.get(group_id)
         if not group:
             return False, f"群组 {group_id} 不存在"
 
@@ -185,69 +668,189 @@ class TopicGraph:
             "related_topics": related_topics
         }
 
-        group['topics'].append(new_topic)
+        op = {"op": "add_topic", "group_id": group_id, "topic": new_topic}
+        self._apply_op(op)
 
-        # 更新映射
-        self.topic_id_to_name[topic_id] = topic_name
-        self.topic_name_to_id[topic_name] = topic_id
+        self._persist(op)
 
-        # 初始化图结构
-        self.graph[topic_id] = []
+        return True, topic_id
 
-        # 连接相关话题
-        for related_topic_name in related_topics:
-            related_topic_id = self.topic_name_to_id.get(related_topic_name)
-            if related_topic_id and related_topic_id != topic_id:
-                # 添加双向连接
-                if related_topic_id not in self.graph[topic_id]:
-                    self.graph[topic_id].append(related_topic_id)
+    @_write_locked
+    def add_topics(self, group_id: str, topics: List[Dict[str, Any]]) -> Tuple[bool, str]:
+        """批量添加话题，全部追加后只重建一次图结构并保存一次，返回(是否成功, 结果消息)"""
+        # 查找群组
+        group = self.group_id_to_group.get(group_id)
+        if not group:
+            return False, f"群组 {group_id} 不存在"
 
-                if topic_id not in self.graph[related_topic_id]:
-                    self.graph[related_topic_id].append(topic_id)
+        # 先检查整批话题的字段和ID，有问题时不做任何修改
+        batch_ids = set()
+        for topic in topics:
+            error = _validate_topic_data(topic)
+            if error:
+                return False, error
+            topic_id = topic['topic_id']
+            if topic_id in batch_ids or self._topic_id_exists(topic_id):
+                return False, f"话题ID {topic_id} 已存在，请使用不同的ID"
+            batch_ids.add(topic_id)
+
+        new_topics = [
+            {
+                "topic_id": topic['topic_id'],
+                "topic_name": topic['topic_name'],
+                "priority": topic.get('priority', '中'),
+                "summaries": topic.get('summaries', []),
+                "related_records": topic.get('related_records', []),
+                "related_topics": topic.get('related_topics', [])
+            }
+            for topic in topics
+        ]
+
+        op = {"op": "add_topics", "group_id": group_id, "topics": new_topics}
+        self._apply_op(op)
+
+        self._persist(op)
+
+        return True, f"成功添加 {len(topics)} 个话题"
+
+    @_write_locked
+    def batch_apply(self, commands_file: str) -> List[Tuple[bool, str]]:
+        """执行NDJSON命令文件，每行形如 {"op": "add_summary", "topic_id": ..., "new_summary": ...}
+
+        op 为修改方法名，其余字段作为该方法的参数；执行期间不逐条保存，全部完成后只保存一次。
+        参数在修改数据之前检查，不合法的命令不会执行；执行中途出错时异常直接抛出，不保存半完成的数据。
+        返回每条命令的 (是否成功, 结果消息)。
+        """
+        results = []
+        json_file = self.json_file
+        self.json_file = None
+        try:
+            with open(commands_file, 'rb') as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        command = _loads(line)
+                        method_name = command.pop("op")
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        results.append((False, f"第 {line_number} 行命令格式错误"))
+                        continue
+
+                    if method_name not in _BATCH_ARG_TYPES:
+                        results.append((False, f"第 {line_number} 行不支持的操作 {method_name}"))
+                        continue
+
+                    method = getattr(self, method_name)
+                    try:
+                        inspect.signature(method).bind(**command)
+                    except TypeError as e:
+                        results.append((False, f"第 {line_number} 行参数错误: {e}"))
+                        continue
+                    error = _validate_batch_arguments(method_name, command)
+                    if error:
+                        results.append((False, f"第 {line_number} 行参数错误: {error}"))
+                        continue
+
+                    results.append(method(**command))
+        finally:
+            self.json_file = json_file
 
         if self.json_file:
             self.save_to_json()
+        return results
 
-        return True, topic_id
-
+    @_write_locked
     def add_chat_records(self, topic_id: str, new_records: List[str]) -> Tuple[bool, str]:
         """向现有话题添加新的聊天记录，返回(是否成功, 结果消息)"""
         topic = self.get_topic_details(topic_id)
         if not topic:
             return False, f"话题 {topic_id} 不存在"
 
-        # 查找话题在数据结构中的位置
-        for group in self.chat_groups:
-            for i, topic_item in enumerate(group.get('topics', [])):
-                if topic_item['topic_id'] == topic_id:
-                    # 添加新的聊天记录
-                    group['topics'][i]['related_records'].extend(new_records)
-
-                    if self.json_file:
-                        self.save_to_json()
-                    return True, f"成功添加 {len(new_records)} 条聊天记录到话题 '{topic['topic_name']}'"
-
-        return False, f"未找到话题 {topic_id}"
-
+        unique_records = self._unique_new_records(topic_id, topic, new_records)
+
+        message = f"成功添加 {len(unique_records)} 条聊天记录到话题 '{topic['topic_name']}'"
+        skipped = len(new_records) - len(unique_records)
+        if skipped:
+            message += f"，跳过 {skipped} 条重复记录"
+        if not unique_records:
+            return True, message
+
+        # 添加新的聊天记录
+        op = {"op": "add_records", "topic_id": topic_id, "records": unique_records}
+        self._apply_op(op)
+
+        self._persist(op)
+        return True, message
+
+    @_write_locked
+    def add_chat_records_bulk(self, updates: Dict[str, List[str]]) -> Tuple[bool, str]:
+        """一次向多个话题添加聊天记录（话题ID -> 新记录列表），只记录/保存一次，返回(是否成功, 结果消息)"""
+        # 先检查全部话题，有不存在的话题时不做任何修改
+        for topic_id in updates:
+            if topic_id not in self.topic_id_to_topic:
+                return False, f"话题 {topic_id} 不存在"
+
+        unique_updates = {}
+        total = 0
+        skipped = 0
+        for topic_id, new_records in updates.items():
+            unique_records = self._unique_new_records(topic_id, self.topic_id_to_topic[topic_id], new_records)
+            skipped += len(new_records) - len(unique_records)
+            if unique_records:
+                unique_updates[topic_id] = unique_records
+                total += len(unique_records)
+
+        message = f"成功向 {len(unique_updates)} 个话题添加 {total} 条聊天记录"
+        if skipped:
+            message += f"，跳过 {skipped} 条重复记录"
+        if not unique_updates:
+            return True, message
+
+        op = {"op": "add_records_bulk", "updates": unique_updates}
+        self._apply_op(op)
+
+        self._persist(op)
+        return True, message
+
+    def _unique_new_records(self, topic_id: str, topic: Dict[str, Any], new_records: List[str]) -> List[str]:
+        """过滤掉话题中已保存的记录，保留的记录同时登记到去重集合
+
+        只与已保存的记录比较，同一批内连续的相同消息（如两条"好的"）都是真实记录，全部保留。
+        """
+        existing_records = self._existing_contents(self._record_sets, topic_id, topic['related_records'])
+        unique_records = [record for record in new_records if record not in existing_records]
+        existing_records.update(unique_records)
+        return unique_records
+
+    @_write_locked
     def add_summary(self, topic_id: str, new_summary: str) -> Tuple[bool, str]:
         """向现有话题添加新的总结，返回(是否成功, 结果消息)"""
         topic = self.get_topic_details(topic_id)
         if not topic:
             return False, f"话题 {topic_id} 不存在"
 
-        # 查找话题在数据结构中的位置
-        for group in self.chat_groups:
-            for i, topic_item in enumerate(group.get('topics', [])):
-                if topic_item['topic_id'] == topic_id:
-                    # 添加新的总结
-                    group['topics'][i]['summaries'].append(new_summary)
+        existing_summaries = self._existing_contents(self._summary_sets, topic_id, topic['summaries'])
+        if new_summary in existing_summaries:
+            # 与 add_chat_records 一致：重复内容算作跳过，不算失败
+            return True, f"成功添加 0 条总结到话题 '{topic['topic_name']}'，跳过 1 条重复总结"
+        existing_summaries.add(new_summary)
 
-                    if self.json_file:
-                        self.save_to_json()
-                    return True, f"成功添加总结到话题 '{topic['topic_name']}'"
+        # 添加新的总结
+        op = {"op": "add_summary", "topic_id": topic_id, "summary": new_summary}
+        self._apply_op(op)
 
-        return False, f"未找到话题 {topic_id}"
+        self._persist(op)
+        return True, f"成功添加总结到话题 '{topic['topic_name']}'"
 
+    @staticmethod
+    def _existing_contents(cache: Dict[str, Set[str]], topic_id: str, contents: List[str]) -> Set[str]:
+        """取话题已有内容的集合，首次使用时由内容列表构建"""
+        existing = cache.get(topic_id)
+        if existing is None:
+            existing = cache[topic_id] = set(contents)
+        return existing
+
+    @_write_locked
     def add_related_topic(self, topic_id: str, related_topic_name: str) -> Tuple[bool, str]:
         """向现有话题添加相关话题，返回(是否成功, 结果消息)"""
         topic = self.get_topic_details(topic_id)
@@ -256,51 +859,32 @@ class TopicGraph:
 
         # 查找相关话题的ID
         related_topic_id = self.topic_name_to_id.get(related_topic_name)
-        if not related_topic_id:
+        if related_topic_id is None:
             return False, f"相关话题 '{related_topic_name}' 不存在"
 
         if related_topic_id == topic_id:
             return False, "不能将话题与自己关联"
 
-        # 查找话题在数据结构中的位置
-        for group in self.chat_groups:
-            for i, topic_item in enumerate(group.get('topics', [])):
-                if topic_item['topic_id'] == topic_id:
-                    # 添加相关话题
-                    if related_topic_name not in group['topics'][i]['related_topics']:
-                        group['topics'][i]['related_topics'].append(related_topic_name)
-
-                        # 更新图结构
-                        if related_topic_id not in self.graph[topic_id]:
-                            self.graph[topic_id].append(related_topic_id)
+        # 添加相关话题（图是无向的，只能按本话题自己的 related_topics 判断是否已关联）
+        if related_topic_name in topic.get('related_topics', []):
+            return False, f"话题 '{topic['topic_name']}' 已与 '{related_topic_name}' 关联"
 
-                        if topic_id not in self.graph[related_topic_id]:
-                            self.graph[related_topic_id].append(topic_id)
+        op = {"op": "add_related", "topic_id": topic_id, "related_topic_name": related_topic_name}
+        self._apply_op(op)
 
-                        if self.json_file:
-                            self.save_to_json()
-                        return True, f"成功将话题 '{topic['topic_name']}' 与 '{related_topic_name}' 关联"
-                    else:
-                        return False, f"话题 '{topic['topic_name']}' 已与 '{related_topic_name}' 关联"
-
-        return False, f"未找到话题 {topic_id}"
+        self._persist(op)
+        return True, f"成功将话题 '{topic['topic_name']}' 与 '{related_topic_name}' 关联"
 
     def _topic_id_exists(self, topic_id: str) -> bool:
         """检查话题ID是否已存在"""
-        for group in self.chat_groups:
-            for topic in group.get('topics', []):
-                if topic['topic_id'] == topic_id:
-                    return True
-        return False
+        return topic_id in self.topic_id_to_topic
 
+    @_read_locked
     def get_topic_details(self, topic_id: str) -> Optional[Dict]:
         """获取话题详细信息"""
-        for group in self.chat_groups:
-            for topic in group.get('topics', []):
-                if topic['topic_id'] == topic_id:
-                    return topic
-        return None
+        return self.topic_id_to_topic.get(topic_id)
 
+    @_read_locked
     def get_topic_chat_records(self, topic_id: str) -> Tuple[bool, Dict]:
         """获取话题的聊天记录，返回(是否成功, 数据字典)"""
         topic = self.get_topic_details(topic_id)
@@ -317,127 +901,232 @@ class TopicGraph:
         }
         return True, result
 
+    @_read_locked
+    def adjacency(self, topic_id: str) -> List[str]:
+        """返回话题的相邻话题ID列表（按ID排序），话题不存在时返回空列表"""
+        return sorted(self.graph.get(topic_id, ()))
+
+    @_read_locked
+    def get_referencing_topics(self, topic_id: str) -> List[Dict]:
+        """获取把指定话题列为相关话题的其他话题（被以下话题引用）"""
+        topic = self.get_topic_details(topic_id)
+        if topic is None:
+            return []
+
+        self._ensure_graph_built()  # 反向引用表随连接一起建立
+        source_ids = self._incoming_related.get(topic['topic_name'], ())
+        return [
+            self.topic_id_to_topic[source_id]
+            for source_id in sorted(source_ids)
+            if source_id != topic_id and source_id in self.topic_id_to_topic
+        ]
+
+    @_read_locked
     def get_sorted_topics(self) -> List[Tuple[str, str, str]]:
         """按优先级排序的话题列表"""
-        # 收集所有话题
-        all_topics = []
-        for group in self.chat_groups:
-            for topic in group.get('topics', []):
-                all_topics.append((topic['topic_id'], topic['topic_name'], topic['priority']))
-
-        # 按优先级降序排序（高 > 中 > 低）
-        sorted_topics = sorted(
-            all_topics,
-            key=lambda x: self._priority_order(x[2]),  # 优先级顺序
-            reverse=True
-        )
-        return sorted_topics
-
+        if self._sorted_topics is not None:
+            return list(self._sorted_topics)
+
+        # 收集所有话题，收集时顺便算好优先级顺序，排序时直接按下标取键
+        priority_order = _PRIORITY_ORDER.get
+        ranked_topics = [
+            (priority_order(topic['priority'], 2), topic['topic_id'], topic['topic_name'], topic['priority'])
+            for group in self.chat_groups
+            for topic in group.get('topics', [])
+        ]
+
+        # 按优先级降序排序（高 > 中 > 低），同优先级保持原有顺序
+        ranked_topics.sort(key=itemgetter(0), reverse=True)
+        self._sorted_topics = [entry[1:] for entry in ranked_topics]
+        return list(self._sorted_topics)
+
+    @_read_locked
     def get_graph_structure(self) -> Dict:
         """获取图结构数据"""
         sorted_topics = self.get_sorted_topics()
-        topic_list = []
-        for i, (topic_id, topic_name, priority) in enumerate(sorted_topics, 1):
-            topic_list.append({
+        topic_list = [
+            {
                 'index': i,
                 'topic_id': topic_id,
                 'topic_name': topic_name,
                 'priority': priority
-            })
-
-        connections = []
-        total_connections = 0
-        for topic_id, connected_ids in self.graph.items():
-            if connected_ids:
-                topic_name = self.topic_id_to_name.get(topic_id, "未知话题")
-                connected_topic_names = []
-                for connected_id in connected_ids:
-                    connected_name = self.topic_id_to_name.get(connected_id, "未知话题")
-                    connected_topic_names.append(connected_name)
-
-                if connected_topic_names:
-                    connections.append({
-                        'source': topic_name,
-                        'targets': connected_topic_names
-                    })
-                    total_connections += len(connected_ids)
+            }
+            for i, (topic_id, topic_name, priority) in enumerate(sorted_topics, 1)
+        ]
+
+        get_name = self.topic_id_to_name.get
+        connections = [
+            {
+                'source': get_name(topic_id, "未知话题"),
+                # 邻接集合无序，按ID排序保证输出稳定
+                'targets': [get_name(connected_id, "未知话题") for connected_id in sorted(connected_ids)]
+            }
+            for topic_id, connected_ids in self.graph.items()
+            if connected_ids
+        ]
 
         return {
             'topic_count': len(sorted_topics),
             'topics': topic_list,
             'connections': connections,
-            'total_connections': total_connections // 2,
+            'total_connections': self._edge_count,
             'auto_cleanup_days': self.auto_cleanup_days
         }
 
+    @_read_locked
+    def to_csr(self) -> Tuple[List[str], array, array]:
+        """导出CSR格式的邻接结构 (话题ID列表, indptr, indices)，供批量分析使用
+
+        第i个话题的邻居下标为 indices[indptr[i]:indptr[i + 1]]，邻居按ID排序；
+        数组为连续的int32，可直接交给 numpy.frombuffer 使用。
+        """
+        topic_ids = list(self.graph)
+        id_to_index = {topic_id: i for i, topic_id in enumerate(topic_ids)}
+
+        indptr = array('i', [0])
+        indices = array('i')
+        for topic_id in topic_ids:
+            indices.extend(id_to_index[neighbor_id] for neighbor_id in sorted(self.graph[topic_id]))
+            indptr.append(len(indices))
+        return topic_ids, indptr, indices
+
+    @_read_locked
     def list_all_groups(self) -> List[Dict]:
         """列出所有群组"""
-        groups = []
-        for group in self.chat_groups:
-            groups.append({
+        return [
+            {
                 'group_id': group['group_id'],
                 'group_name': group['group_name'],
                 'description': group['description'],
                 'topic_count': len(group.get('topics', []))
-            })
-        return groups
+            }
+            for group in self.chat_groups
+        ]
+
+    def _ensure_search_index(self) -> List[Tuple[str, str, Dict, Dict]]:
+        """按需构建搜索用的小写文本和倒排索引，数据变化后只重新生成一次"""
+        search_index = self._search_index
+        if search_index is not None:
+            return search_index
+
+        with self._lazy_lock:
+            if self._search_index is not None:
+                return self._search_index
+            search_index = [
+                (topic['topic_name'].lower(), ' '.join(topic.get('summaries', [])).lower(), topic, group)
+                for group in self.chat_groups
+                for topic in group.get('topics', [])
+            ]
+            token_index = {}
+            bigram_index = {}
+            for position, (name_lc, summary_lc, _, _) in enumerate(search_index):
+                for token in _TOKEN_RE.findall(name_lc + ' ' + summary_lc):
+                    token_index.setdefault(token, set()).add(position)
+                # 中文没有空格分词，按字符二元组建索引，任意长度不小于2的子串都能用它筛选
+                text = name_lc + '\x00' + summary_lc
+                for bigram in {text[i:i + 2] for i in range(len(text) - 1)}:
+                    bigram_index.setdefault(bigram, set()).add(position)
+            # 倒排索引就绪后才发布 _search_index，其他读线程不会用到不完整的索引
+            self._token_index = token_index
+            self._bigram_index = bigram_index
+            self._search_index = search_index
+        return search_index
+
+    @_read_locked
+    def search_topic(self, keyword: str, whole_word: bool = False) -> List[Dict]:
+        """搜索话题；whole_word为True时按完整词匹配（查倒排索引，多个词取交集）"""
+        search_index = self._ensure_search_index()
+        keyword = keyword.lower()
+
+        if whole_word:
+            tokens = _TOKEN_RE.findall(keyword)
+            if not tokens:
+                return []
+            positions = set(self._token_index.get(tokens[0], ()))
+            for token in tokens[1:]:
+                positions &= self._token_index.get(token, set())
+            candidates = [search_index[position] for position in sorted(positions)]
+        elif len(keyword) >= 2:
+            # 包含关键词的话题一定包含它的全部二元组，先取交集缩小范围再做子串确认
+            posting_lists = sorted(
+                (self._bigram_index.get(keyword[i:i + 2], set()) for i in range(len(keyword) - 1)),
+                key=len
+            )
+            positions = set(posting_lists[0])
+            for posting_list in posting_lists[1:]:
+                if not positions:
+                    break
+                positions &= posting_list
+            candidates = [
+                entry for entry in (search_index[position] for position in sorted(positions))
+                if keyword in entry[0] or keyword in entry[1]
+            ]
+        else:
+            candidates = [
+                entry for entry in search_index
+                if keyword in entry[0] or keyword in entry[1]
+            ]
 
-    def search_topic(self, keyword: str) -> List[Dict]:
-        """搜索话题"""
         results = []
-        for group in self.chat_groups:
-            for topic in group.get('topics', []):
-                if (keyword.lower() in topic['topic_name'].lower() or
-                    keyword.lower() in ' '.join(topic.get('summaries', [])).lower()):
-                    results.append({
-                        'topic_id': topic['topic_id'],
-                        'topic_name': topic['topic_name'],
-                        'group_name': group['group_name'],
-                        'priority': topic['priority'],
-                        'summaries': topic.get('summaries', [])
-                    })
+        for _, _, topic, group in candidates:
+            results.append({
+                'topic_id': topic['topic_id'],
+                'topic_name': topic['topic_name'],
+                'group_name': group['group_name'],
+                'priority': topic['priority'],
+                'summaries': topic.get('summaries', [])
+            })
         return results
 
+    @_read_locked
     def find_topic_by_id_or_name(self, identifier: str) -> Optional[Dict]:
         """通过ID或名称查找话题"""
+        # 已在读锁内，直接查索引，不再经过 get_topic_details 重复加锁
+        topic_id_to_topic = self.topic_id_to_topic
+
         # 先尝试按ID查找
-        topic_details = self.get_topic_details(identifier)
-        if topic_details:
+        topic_details = topic_id_to_topic.get(identifier)
+        if topic_details is not None:
             return topic_details
 
         # 再尝试按名称查找
         topic_id = self.topic_name_to_id.get(identifier)
-        if topic_id:
-            return self.get_topic_details(topic_id)
+        if topic_id is not None:
+            return topic_id_to_topic.get(topic_id)
 
         return None
 
+    @_write_locked
     def cleanup_old_topics(self, days: int = None):
         """清理过期话题（基于最后访问时间）"""
         if days is None:
             days = self.auto_cleanup_days
 
         # 这里简化处理
-        if self.json_file:
-            self.save_to_json()
+        self._persist()
 
     def start_auto_cleanup(self, interval_hours: int = 24):
-        """启动自动清理线程"""
+        """启动自动清理线程，线程已在运行时不再重复启动"""
+        if self.cleanup_thread is not None and self.cleanup_thread.is_alive():
+            return
 
-        def cleanup_loop():
-            while self.running:
-                self.cleanup_old_topics()
-                time.sleep(interval_hours * 3600)  # 转换为秒
-
-        self.cleanup_thread = threading.Thread(target=cleanup_loop)
+        self._stop_event.clear()  # 停止后可以重新启动
+        self.cleanup_thread = threading.Thread(target=self._cleanup_loop, args=(interval_hours * 3600,))  # 转换为秒
         self.cleanup_thread.daemon = True
         self.cleanup_thread.start()
 
+    def _cleanup_loop(self, interval_seconds: float):
+        """清理线程主循环，收到停止通知时立即退出"""
+        while not self._stop_event.is_set():
+            self.cleanup_old_topics()
+            if self._stop_event.wait(interval_seconds):
+                break
+
     def stop_auto_cleanup(self):
         """停止自动清理线程"""
-        self.running = False
+        self._stop_event.set()
         if self.cleanup_thread:
-            self.cleanup_thread.join(timeout=1)
+            self.cleanup_thread.join()
 
     def update_settings(self, auto_cleanup_days: int = None):
         """更新设置"""